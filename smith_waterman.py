@@ -3,10 +3,177 @@
 import os
 import sys
 import time
+import mmap
 import argparse
 import textwrap
 import traceback
-from collections import OrderedDict
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+# Traceback bit flags stored per cell by the fill kernels; a cell keeps
+# every direction that reached the maximum, consumers decode by priority
+# (diagonal, left, up). No bits set means the cell was clamped to zero
+TRACE_DIAGONAL = 1
+TRACE_LEFT = 2
+TRACE_UP = 4
+TRACE_ZERO = 8
+
+# Matrices with at least this many cells are filled with the threaded
+# wavefront kernel (per-diagonal threading is overhead below this)
+PARALLEL_MIN_CELLS = 4000000
+
+@njit(cache = True, nogil = True, fastmath = False)
+def fill_dp(profile, t, gap, matrix, trace):
+    max_score = 0
+    max_row = 0
+    max_col = 0
+    for i in range(1, t.shape[0] + 1):
+        for j in range(1, profile.shape[0] + 1):
+            match = matrix[i - 1, j - 1] + profile[j - 1, t[i - 1]]
+            delete = matrix[i, j - 1] + gap
+            insert = matrix[i - 1, j] + gap
+            maximum = max(match, delete, insert, 0)
+
+            # Branchless direction bitmask
+            trace[i, j] = ((match == maximum) * TRACE_DIAGONAL
+                           + (delete == maximum) * TRACE_LEFT
+                           + (insert == maximum) * TRACE_UP
+                           + (maximum == 0) * TRACE_ZERO)
+
+            matrix[i, j] = maximum
+            if maximum > max_score:
+                max_score = maximum
+                max_row = i
+                max_col = j
+
+    return max_score, max_row, max_col
+
+@njit(cache = True, nogil = True, fastmath = False)
+def fill_dp_banded(profile, t, gap, band, matrix, trace):
+    # Banded fill: only cells with |i - j| <= band are scored, the rest
+    # stay zero. An O(m * band) approximation for similar sequences
+    n = profile.shape[0]
+    m = t.shape[0]
+    max_score = 0
+    max_row = 0
+    max_col = 0
+    for i in range(1, m + 1):
+        for j in range(max(1, i - band), min(n, i + band) + 1):
+            match = matrix[i - 1, j - 1] + profile[j - 1, t[i - 1]]
+            delete = matrix[i, j - 1] + gap
+            insert = matrix[i - 1, j] + gap
+            maximum = max(match, delete, insert, 0)
+
+            # Branchless direction bitmask
+            trace[i, j] = ((match == maximum) * TRACE_DIAGONAL
+                           + (delete == maximum) * TRACE_LEFT
+                           + (insert == maximum) * TRACE_UP
+                           + (maximum == 0) * TRACE_ZERO)
+
+            matrix[i, j] = maximum
+            if maximum > max_score:
+                max_score = maximum
+                max_row = i
+                max_col = j
+
+    return max_score, max_row, max_col
+
+@njit(cache = True, nogil = True, fastmath = False)
+def fill_dp_score(profile, t, gap):
+    # Score-only fill: two rolling rows instead of the full matrix and
+    # traceback, for callers that never reconstruct the alignment
+    n = profile.shape[0]
+    m = t.shape[0]
+    prev = np.zeros(n + 1, dtype = np.int32)
+    cur = np.zeros(n + 1, dtype = np.int32)
+    max_score = 0
+    for i in range(1, m + 1):
+        for j in range(1, n + 1):
+            match = prev[j - 1] + profile[j - 1, t[i - 1]]
+            delete = cur[j - 1] + gap
+            insert = prev[j] + gap
+            maximum = max(match, delete, insert, 0)
+            cur[j] = maximum
+            if maximum > max_score:
+                max_score = maximum
+        prev, cur = cur, prev
+
+    return max_score
+
+@njit(parallel = True, cache = True, fastmath = False)
+def fill_dp_parallel(profile, t, gap, matrix, trace):
+    # Wavefront: cells on an anti-diagonal i + j = k are independent,
+    # so each diagonal is split across threads
+    n = profile.shape[0]
+    m = t.shape[0]
+    for k in range(2, m + n + 1):
+        ilo = max(1, k - n)
+        ihi = min(m, k - 1)
+        for i in prange(ilo, ihi + 1):
+            j = k - i
+            match = matrix[i - 1, j - 1] + profile[j - 1, t[i - 1]]
+            delete = matrix[i, j - 1] + gap
+            insert = matrix[i - 1, j] + gap
+            maximum = max(match, delete, insert, 0)
+
+            # Branchless direction bitmask
+            trace[i, j] = ((match == maximum) * TRACE_DIAGONAL
+                           + (delete == maximum) * TRACE_LEFT
+                           + (insert == maximum) * TRACE_UP
+                           + (maximum == 0) * TRACE_ZERO)
+
+            matrix[i, j] = maximum
+
+    # Row-major scan keeps the same first-maximum tie-breaking as fill_dp
+    max_score = 0
+    max_row = 0
+    max_col = 0
+    for i in range(1, m + 1):
+        for j in range(1, n + 1):
+            if matrix[i, j] > max_score:
+                max_score = matrix[i, j]
+                max_row = i
+                max_col = j
+
+    return max_score, max_row, max_col
+
+def fill_dp_numpy(profile, t, gap, matrix, trace):
+    # Anti-diagonal wavefront: every cell on a diagonal i + j = k only
+    # depends on diagonals k - 1 and k - 2, so each one is a single
+    # vectorized update instead of a Python loop over cells
+    n = profile.shape[0]
+    m = t.shape[0]
+    scores = profile[:, t].T.astype(np.int32)
+
+    for k in range(2, m + n + 1):
+        i = np.arange(max(1, k - n), min(m, k - 1) + 1)
+        j = k - i
+
+        match = matrix[i - 1, j - 1] + scores[i - 1, j - 1]
+        delete = matrix[i, j - 1] + gap
+        insert = matrix[i - 1, j] + gap
+        maximum = np.maximum.reduce([match, delete, insert, np.zeros(i.shape[0], dtype = np.int32)])
+
+        matrix[i, j] = maximum
+        trace[i, j] = ((match == maximum) * TRACE_DIAGONAL
+                       + (delete == maximum) * TRACE_LEFT
+                       + (insert == maximum) * TRACE_UP
+                       + (maximum == 0) * TRACE_ZERO)
+
+    index = int(np.argmax(matrix))
+    max_row, max_col = divmod(index, matrix.shape[1])
+    return int(matrix[max_row, max_col]), max_row, max_col
 
 def menu(args):
     parser = argparse.ArgumentParser(formatter_class = argparse.RawDescriptionHelpFormatter,
@@ -28,6 +195,7 @@ def menu(args):
     parser.add_argument("-m", "--match", default = 1, type = int, help = "Match value (Only for nucleotide sequence) [default: 1].")
     parser.add_argument("-mi", "--mismatch_penalty", default = 0, type = int, help = "Mismatch penalty value (Only for nucleotide sequence) [default: 0].")
     parser.add_argument("-gap", "--gap_penalty", default = 0, type = int, help = "Gap penalty value [default: 0].")
+    parser.add_argument("-b", "--bandwidth", default = None, type = int, help = "Band width: restricts the alignment to cells with |i - j| <= BANDWIDTH (for long, similar sequences).")
     parser.add_argument("-o", "--output", metavar = "FOLDER", help = "Output folder")
     parser.add_argument("--version", action = "version", version = "%s %s" % ('%(prog)s', oalig.VERSION))
     args = parser.parse_args()
@@ -37,6 +205,7 @@ def menu(args):
     # oalig.SEQUENCE1 = args.sequence1
     # oalig.SEQUENCE2 = args.sequence2
     oalig.GAP_PENALTY = args.gap_penalty
+    oalig.BANDWIDTH = args.bandwidth
     oalig.MATCH = args.match
     oalig.MISMATCH_PENALTY = args.mismatch_penalty
 
@@ -102,24 +271,21 @@ class SmithWaterman:
         self.MATCH = None
         self.MISMATCH_PENALTY = None
         self.GAP_PENALTY = None
+        self.BANDWIDTH = None
 
-        self.ZERO = 0
         self.MAX_SCORE = {'score': 0, 'row': 0, 'col': 0}
 
         self.MATRIX_TYPE = None
         self.SUBSTITUTION_MATRIX = None
+        self.SUB_MATRIX = None
+        self._MATRIX_CACHE = {}
 
-        self.param_diagonal = 'd'
-        self.param_up = 'u'
-        self.param_left = 'l'
-        self.param_zero = 'z'
-        self.param_maximum = 'm'
-        self.param_direction = 'a'
-
-        self.direct_diagonal = 'diagonal'
-        self.direct_up = 'up'
-        self.direct_left = 'left'
-        self.direct_zero = 'zero'
+        # ASCII -> [0..23] encoding (20 amino acids + B, Z, X, *), case-insensitive
+        self.ALPHABET = 'ARNDCQEGHILKMFPSTWYVBZX*'
+        self.ENCODE_LUT = np.full(256, self.ALPHABET.index('X'), dtype = np.uint8)
+        for index, letter in enumerate(self.ALPHABET):
+            self.ENCODE_LUT[ord(letter)] = index
+            self.ENCODE_LUT[ord(letter.lower())] = index
 
     def mode_information(self, array1, array2):
         _information = ["%s: %s" % (i, j) for i, j in zip(array1, array2)]
@@ -172,48 +338,36 @@ class SmithWaterman:
         return output
 
     def get_num_lines(self, input_file):
-        num_lines = sum(1 for line in open(input_file))
+        num_lines = 0
+        with open(input_file, 'rb') as fr:
+            for block in iter(lambda: fr.read(1 << 20), b''):
+                num_lines += block.count(b'\n')
         return num_lines
 
-    def init_matrix(self, rows, cols):
-        opt = {self.param_diagonal: 0,
-               self.param_up: 0,
-               self.param_left: 0,
-               self.param_zero: 0,
-               self.param_maximum: 0,
-               self.param_direction: []}
-        arr = [opt for i in range(cols + 1)]
-        matrix = [arr.copy() for i in range(rows + 1)]
-
-        # First column
-        for i in range(rows + 1):
-            matrix[i][0] = self.ZERO
+    def init_matrix(self, rows, cols, dtype = np.int32):
+        matrix = np.zeros((rows + 1, cols + 1), dtype = dtype)
+        trace = np.zeros((rows + 1, cols + 1), dtype = np.uint8)
+        return matrix, trace
 
-        # First row
-        for j in range(cols + 1):
-            matrix[0][j] = self.ZERO
-
-        return matrix
+    def _encode_seq(self, sequence):
+        raw = np.frombuffer(sequence.encode(), dtype = np.uint8)
+        return self.ENCODE_LUT[raw]
 
     def delta(self, si, sj):
-        si = si.upper()
-        sj = sj.upper()
-
-        value = None
-        if self.SEQUENCE_TYPE == self.TYPE_SEQ_NT:
-            if si == sj:
-                value = self.MATCH
-            else:
-                value = self.MISMATCH_PENALTY
-        elif self.SEQUENCE_TYPE == self.TYPE_SEQ_AA:
-            try:
-                value = self.SUBSTITUTION_MATRIX[si + sj]
-            except Exception as e:
-                value = self.SUBSTITUTION_MATRIX[sj + si]
-
-        return value
+        # The packed table is symmetrized at build time, so a single
+        # indexed load covers both residue orders and both sequence types
+        si = self.ENCODE_LUT[ord(si)]
+        sj = self.ENCODE_LUT[ord(sj)]
+        return int(self.SUB_MATRIX[si, sj])
 
     def init_substitution_matrix(self):
+        # Memoized: batch use re-selects the same matrix without
+        # rebuilding the dict literal and the packed table
+        key = (self.SEQUENCE_TYPE, self.MATRIX_TYPE, self.MATCH, self.MISMATCH_PENALTY)
+        if key in self._MATRIX_CACHE:
+            self.SUBSTITUTION_MATRIX, self.SUB_MATRIX = self._MATRIX_CACHE[key]
+            return
+
         self.SUBSTITUTION_MATRIX = {}
         if self.MATRIX_TYPE == self.MATRIX_BLOSUM45:
             self.SUBSTITUTION_MATRIX = {'AA': 5, 'AR': -2, 'AN': -1, 'AD': -2, 'AC': -1, 'AQ': -1, 'AE': -1, 'AG': 0, 'AH': -2, 'AI': -1, 'AL': -1, 'AK': -1,
@@ -368,161 +522,158 @@ class SmithWaterman:
                                         'PW': -6, 'PY': -5, 'PV': -1, 'SS': 2, 'ST': 1, 'SW': -2, 'SY': -3, 'SV': -1, 'TT': 3, 'TW': -5, 'TY': -3, 'TV': 0,
                                         'WW': 17, 'WY': 0, 'WV': -6, 'YY': 10, 'YV': -2, 'VV': 4}
 
+        # Pack the dict into a contiguous table for indexed lookups in fill_dp
+        size = len(self.ALPHABET)
+        self.SUB_MATRIX = np.zeros((size, size), dtype = np.int16)
+        if self.SEQUENCE_TYPE == self.TYPE_SEQ_NT:
+            self.SUB_MATRIX[:] = self.MISMATCH_PENALTY
+            np.fill_diagonal(self.SUB_MATRIX, self.MATCH)
+        else:
+            for pair, value in self.SUBSTITUTION_MATRIX.items():
+                si = self.ALPHABET.index(pair[0])
+                sj = self.ALPHABET.index(pair[1])
+                self.SUB_MATRIX[si, sj] = value
+                self.SUB_MATRIX[sj, si] = value
+
+        self._MATRIX_CACHE[key] = (self.SUBSTITUTION_MATRIX, self.SUB_MATRIX)
+
+    def smith_waterman_score(self, seq1, seq2):
+        q = self._encode_seq(seq1)
+        t = self._encode_seq(seq2)
+        profile = np.ascontiguousarray(self.SUB_MATRIX[q])
+        return int(fill_dp_score(profile, t, self.GAP_PENALTY))
+
+    def smith_waterman_batch(self, pairs):
+        # Score-only batch: the kernels release the GIL (nogil), so a
+        # thread per core scales for many-pair workloads
+        with ThreadPoolExecutor(max_workers = os.cpu_count()) as executor:
+            return list(executor.map(lambda pair: self.smith_waterman_score(pair[0], pair[1]), pairs))
+
     def smith_waterman(self, seq1, seq2):
-        arr_seq1 = [i for i in seq1]
-        arr_seq2 = [i for i in seq2]
-        n = len(arr_seq1)
-        m = len(arr_seq2)
-        matrix = self.init_matrix(m, n)
-
-        for i in range(1, m + 1):
-            for j in range(1, n + 1):
-                options_d = matrix[i - 1][j - 1]
-                options_u = matrix[i - 1][j]
-                options_l = matrix[i][j - 1]
-                options = matrix[i][j].copy()
-
-                value_d = options_d[self.param_maximum] if isinstance(options_d, dict) else options_d
-                value_u = options_u[self.param_maximum] if isinstance(options_u, dict) else options_u
-                value_l = options_l[self.param_maximum] if isinstance(options_l, dict) else options_l
-
-                match = value_d + self.delta(arr_seq1[j - 1], arr_seq2[i - 1])
-                delete = value_l + self.GAP_PENALTY
-                insert = value_u + self.GAP_PENALTY
-                maximum = max(match, delete, insert, self.ZERO)
-
-                direction = options[self.param_direction].copy()
-                if match < 0 and delete < 0 and insert < 0:
-                    direction.append(self.direct_zero)
-                if maximum == match:
-                    direction.append(self.direct_diagonal)
-                if maximum == delete:
-                    direction.append(self.direct_left)
-                if maximum == insert:
-                    direction.append(self.direct_up)
-                options[self.param_direction] = direction.copy()
-
-                options[self.param_diagonal] = match
-                options[self.param_left] = delete
-                options[self.param_up] = insert
-                options[self.param_zero] = self.ZERO
-                options[self.param_maximum] = maximum
-                matrix[i][j] = options
-
-                if maximum > self.MAX_SCORE['score']:
-                    self.MAX_SCORE['score'] = maximum
-                    self.MAX_SCORE['row'] = i
-                    self.MAX_SCORE['col'] = j
-
-        # Traceback
-        align1 = ''
-        align2 = ''
-        i = self.MAX_SCORE['row']
-        j = self.MAX_SCORE['col']
+        q = self._encode_seq(seq1)
+        t = self._encode_seq(seq2)
+        n = len(q)
+        m = len(t)
+        # Query profile: one row of scores per query residue
+        profile = np.ascontiguousarray(self.SUB_MATRIX[q])
+
+        # Narrow the score cells when the best possible score provably
+        # fits in 16 bits (halves the memory traffic of the fill); a path
+        # has at most n + m steps, each gaining at most the largest
+        # substitution score or (if positive) the gap value
+        score_bound = (n + m) * max(int(profile.max(initial = 0)), self.GAP_PENALTY, 1)
+        dtype = np.int16 if score_bound < np.iinfo(np.int16).max else np.int32
+        matrix, trace = self.init_matrix(m, n, dtype)
+
+        if self.BANDWIDTH is not None:
+            score, row, col = fill_dp_banded(profile, t, self.GAP_PENALTY, self.BANDWIDTH, matrix, trace)
+        elif NUMBA_AVAILABLE:
+            if n * m >= PARALLEL_MIN_CELLS:
+                score, row, col = fill_dp_parallel(profile, t, self.GAP_PENALTY, matrix, trace)
+            else:
+                score, row, col = fill_dp(profile, t, self.GAP_PENALTY, matrix, trace)
+        else:
+            score, row, col = fill_dp_numpy(profile, t, self.GAP_PENALTY, matrix, trace)
+
+        score = int(score)
+        row = int(row)
+        col = int(col)
+        self.MAX_SCORE = {'score': score, 'row': row, 'col': col}
+
+        # Traceback (bytearray appends are amortized O(1); one reverse at the end)
+        seq1_bytes = seq1.encode()
+        seq2_bytes = seq2.encode()
+        gap_char = ord('-')
+        align1 = bytearray()
+        align2 = bytearray()
+        i = row
+        j = col
         while i > 0 and j > 0:
-            options_current = matrix[i][j]
-            direction = options_current[self.param_direction]
-
-            if options_current[self.param_maximum] == 0:
+            if matrix[i, j] == 0:
                 break
 
-            if self.direct_diagonal in direction:
+            direction = trace[i, j]
+            if direction & TRACE_DIAGONAL:
                 # Optimal alignment
                 # Diagonal
-                align1 += arr_seq1[j - 1]
-                align2 += arr_seq2[i - 1]
+                align1.append(seq1_bytes[j - 1])
+                align2.append(seq2_bytes[i - 1])
                 i -= 1
                 j -= 1
-            elif self.direct_left in direction:
+            elif direction & TRACE_LEFT:
                 # Horizontal
-                align1 += arr_seq1[j - 1]
-                align2 += '-'
+                align1.append(seq1_bytes[j - 1])
+                align2.append(gap_char)
                 j -= 1
-            elif self.direct_up in direction:
+            elif direction & TRACE_UP:
                 # Vertical
-                align1 += '-'
-                align2 += arr_seq2[i - 1]
+                align1.append(gap_char)
+                align2.append(seq2_bytes[i - 1])
                 i -= 1
+            else:
+                break
+
+        align1 = align1[::-1].decode()
+        align2 = align2[::-1].decode()
+
+        return align1, align2, score, matrix, trace
+
+    def matrix_format(self, matrix, trace, arr_seq1, arr_seq2):
+        # Highest-priority direction bit per cell
+        body = trace[1:, 1:]
+        codes = np.where(body & TRACE_DIAGONAL, 'd',
+                         np.where(body & TRACE_LEFT, 'l',
+                                  np.where(body & TRACE_UP, 'u', 'z')))
 
-        align1 = align1[::-1]
-        align2 = align2[::-1]
-
-        return align1, align2, self.MAX_SCORE['score'], matrix
-
-    def matrix_format(self, matrix, arr_seq1, arr_seq2):
-        matrix_sum = []
-        matrix_row = []
-        for row in matrix:
-            for cell in row:
-                if isinstance(cell, dict):
-                    direction = cell[self.param_direction]
-                    maximum = cell[self.param_maximum]
-
-                    if self.direct_zero in direction:
-                        matrix_row.append('%s|%s' % (maximum, 'z'))
-                    elif self.direct_diagonal in direction:
-                        matrix_row.append('%s|%s' % (maximum, 'd'))
-                    elif self.direct_left in direction:
-                        matrix_row.append('%s|%s' % (maximum, 'l'))
-                    elif self.direct_up in direction:
-                        matrix_row.append('%s|%s' % (maximum, 'u'))
-
-            if matrix_row:
-                matrix_sum.append(matrix_row)
-                matrix_row = []
-
-        nchars = 0
-        matrix_full = []
-        for row in matrix_sum:
-            for cell in row:
-                nchars = len(cell) if len(cell) > nchars else nchars
-        for index, row in enumerate(matrix_sum, start = 1):
-            if index == 1:
-                head_row = ['-', '-']
-                first_row = ['-', '0']
-                for idx, cell in enumerate(row, start = 1):
-                    head_row.append(arr_seq1[idx - 1].rjust(nchars, ' '))
-                    first_row.append('0'.rjust(nchars, ' '))
-                matrix_full.append(head_row)
-                matrix_full.append(first_row)
-            rows = [arr_seq2[index - 1], '0']
-            for cell in row:
-                rows.append(cell.rjust(nchars, ' '))
-            matrix_full.append(rows)
+        # 'score|direction' cells for the whole matrix in one shot
+        cells = np.char.add(np.char.add(matrix[1:, 1:].astype(str), '|'), codes)
+        nchars = int(np.char.str_len(cells).max())
+        cells = np.char.rjust(cells, nchars)
+
+        head_row = ['-', '-'] + [letter.rjust(nchars, ' ') for letter in arr_seq1]
+        first_row = ['-', '0'] + ['0'.rjust(nchars, ' ')] * len(arr_seq1)
+
+        matrix_full = [head_row, first_row]
+        for index, row in enumerate(cells, start = 1):
+            matrix_full.append([arr_seq2[index - 1], '0'] + list(row))
 
         return matrix_full
 
+    def find_header(self, mm, start):
+        # Next '>' at the start of a line, from offset `start`
+        pos = mm.find(b'>', start)
+        while pos > 0 and mm[pos - 1:pos] != b'\n':
+            pos = mm.find(b'>', pos + 1)
+        return pos
+
     def get_sequences(self):
-        collect_seq = OrderedDict()
+        collect_seq = {}
 
-        if self.get_num_lines(self.FASTA_FILE) == 0:
+        if os.stat(self.FASTA_FILE).st_size == 0:
             self.show_print("The '%s' file is empty" % (os.path.basename(self.FASTA_FILE)), [self.LOG_FILE])
             exit()
         else:
-            head = ''
-            sequence = ''
-            num_seq = 1
-            with open(self.FASTA_FILE, 'r') as fr:
-                for line in fr:
-                    line = line.strip()
-
-                    if line.startswith('>'):
-                        if sequence:
-                            collect_seq.update({head: sequence})
-                            head = ''
-                            sequence = ''
-                            num_seq += 1
-
-                        if num_seq > 2: # Num sequences
-                            break
-
-                        head = line.split(' ')[0]
-                    else:
-                        sequence += line
-
-                if sequence:
-                    collect_seq.update({head: sequence})
-            fr.close()
+            # Single pass over a memory-mapped view: record boundaries are
+            # found with mm.find (memchr) instead of a Python line loop
+            with open(self.FASTA_FILE, 'rb') as fr:
+                mm = mmap.mmap(fr.fileno(), 0, access = mmap.ACCESS_READ)
+
+                pos = self.find_header(mm, 0)
+                while pos != -1 and len(collect_seq) < 2: # Num sequences
+                    end_line = mm.find(b'\n', pos)
+                    if end_line == -1:
+                        end_line = mm.size()
+
+                    next_pos = self.find_header(mm, end_line)
+                    end_seq = mm.size() if next_pos == -1 else next_pos
+
+                    head = mm[pos:end_line].decode().strip().split(' ')[0]
+                    sequence = mm[end_line:end_seq].translate(None, delete = b' \t\r\n').decode()
+                    if sequence:
+                        collect_seq.update({head: sequence})
+
+                    pos = next_pos
+                mm.close()
 
             self.HEAD1, self.HEAD2 = list(collect_seq.keys())
             self.HEAD1 = self.HEAD1.replace('>', '')
@@ -532,24 +683,15 @@ class SmithWaterman:
         return collect_seq
 
     def get_alignment_characters(self, alignment1, alignment2):
-        merged_list = [(alignment1[i], alignment2[i]) for i in range(0, len(alignment1))]
+        align1 = alignment1
+        align2 = alignment2
 
-        align1 = ''
-        align2 = ''
-        characters = ''
-        for tupla in merged_list:
-            si = tupla[0]
-            sj = tupla[1]
-
-            char = '•'
-            if si.upper() == sj.upper():
-                char = '|'
-            elif si == '-' or sj == '-':
-                char = ' '
-
-            align1 += si
-            align2 += sj
-            characters += char
+        # '|' match (case-insensitive), ' ' gap, '•' mismatch
+        a1 = np.frombuffer(align1.encode(), dtype = np.uint8)
+        a2 = np.frombuffer(align2.encode(), dtype = np.uint8)
+        matches = (a1 & 0xDF) == (a2 & 0xDF)
+        gaps = (a1 == ord('-')) | (a2 == ord('-'))
+        characters = ''.join(np.where(matches, '|', np.where(gaps, ' ', '•')))
 
         size_left = 0
         if len(self.HEAD1) > size_left:
@@ -582,12 +724,12 @@ class SmithWaterman:
 
         return alignment
 
-    def save_matrix(self, matrix):
+    def save_matrix(self, matrix, trace):
         arr_seq1 = [i for i in self.SEQUENCE1]
         arr_seq2 = [i for i in self.SEQUENCE2]
 
         with open(self.MATRIX_FILE, 'w') as fw:
-            for row in self.matrix_format(matrix, arr_seq1, arr_seq2):
+            for row in self.matrix_format(matrix, trace, arr_seq1, arr_seq2):
                 fw.write('%s\n' % ' '.join(row))
         fw.close()
 
@@ -611,6 +753,7 @@ def main(args):
 
         oalig.show_print("Parameters:", [oalig.LOG_FILE])
         if oalig.SEQUENCE_TYPE == oalig.TYPE_SEQ_NT:
+            oalig.init_substitution_matrix()
             oalig.show_print("  Match: %s" % oalig.MATCH, [oalig.LOG_FILE])
             oalig.show_print("  Mismatch penalty: %s" % oalig.MISMATCH_PENALTY, [oalig.LOG_FILE])
         elif oalig.SEQUENCE_TYPE == oalig.TYPE_SEQ_AA:
@@ -623,9 +766,9 @@ def main(args):
         dict_sequences = oalig.get_sequences()
         oalig.show_print("Alignment:", [oalig.LOG_FILE])
 
-        alignment1, alignment2, score, matrix = oalig.smith_waterman(oalig.SEQUENCE1, oalig.SEQUENCE2)
+        alignment1, alignment2, score, matrix, trace = oalig.smith_waterman(oalig.SEQUENCE1, oalig.SEQUENCE2)
         alignment = oalig.get_alignment_characters(alignment1, alignment2)
-        oalig.save_matrix(matrix)
+        oalig.save_matrix(matrix, trace)
 
         oalig.show_print("  Score: %s" % score, [oalig.LOG_FILE])
         oalig.show_print("", [oalig.LOG_FILE])